@@ -6,104 +6,175 @@ Generates a complete 16MB Flash image with all resources and deploys to web-app
 
 import os
 import sys
+import argparse
+import importlib
 import subprocess
 import time
 
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+TOOLS_DIR = os.path.join(SCRIPT_DIR, 'tools')
+ASSETS_DIR = os.path.join(SCRIPT_DIR, 'assets')
+FONT_OUTPUT_DIR = os.path.join(ASSETS_DIR, 'font_output')
+OUTPUT_FILE = os.path.join(SCRIPT_DIR, 'w25q128jv_complete.bin')
+WEBAPP_FILE = os.path.join(SCRIPT_DIR, 'web-app', 'w25q128jv_complete.bin')
+
+NEXT_STEPS = """\
+💡 Next steps:
+   1. Program the firmware to your W25Q128JV Flash
+   2. Open web-app/index.html to preview the content
+   3. Use the firmware in your STM32G4 project"""
+
+# Tool scripts resolved once, used when running in isolated mode
+TOOL_SCRIPTS = {
+    tool: os.path.join(TOOLS_DIR, f'{tool}.py')
+    for tool in ('font_converter', 'svg_to_rgb565', 'flash_composer')
+}
+
 def run_command(cmd, description):
-    """Run a command and handle errors"""
+    """Run a command, letting it write straight to our terminal, and handle errors"""
+    print(f"🔧 {description}...")
+    sys.stdout.flush()
+    # No shell, cwd or fd closing so CPython can launch the child with posix_spawn
+    # rather than fork+exec of this (possibly large) process
+    proc = subprocess.run(cmd, close_fds=False)
+
+    if proc.returncode != 0:
+        print(f"   ❌ {description} failed: {subprocess.CalledProcessError(proc.returncode, cmd)}")
+        return False
+
+    print(f"   ✅ {description} completed")
+    return True
+
+def run_tool(tool, args, description):
+    """Run a tool's main() in-process and handle errors"""
     print(f"🔧 {description}...")
     try:
-        result = subprocess.run(cmd, shell=True, check=True, capture_output=True, text=True)
-        print(f"   ✅ {description} completed")
-        if result.stdout.strip():
-            print(f"   📄 Output: {result.stdout.strip()}")
-        return True
-    except subprocess.CalledProcessError as e:
+        exit_code = importlib.import_module(tool).main(args)
+    except SystemExit as e:
+        exit_code = e.code
+    except Exception as e:
         print(f"   ❌ {description} failed: {e}")
-        if e.stderr:
-            print(f"   📄 Error: {e.stderr.strip()}")
         return False
 
-def main():
+    if exit_code:
+        print(f"   ❌ {description} failed: exit status {exit_code}")
+        return False
+
+    print(f"   ✅ {description} completed")
+    return True
+
+def run_step(tool, args, description, isolated=False):
+    """Run a tool either in-process or in its own interpreter"""
+    if isolated:
+        return run_command([sys.executable, TOOL_SCRIPTS[tool], *args], description)
+    return run_tool(tool, args, description)
+
+def run_steps(steps, isolated=False):
+    """Run steps one after another, stopping at the first failure"""
+    return all(run_step(*step, isolated) for step in steps)
+
+PARSER = argparse.ArgumentParser(description="Generate a complete 16MB Flash image with all resources")
+PARSER.add_argument('--isolated', action='store_true',
+                    help="Run the font, boot screen and flash composer tools in their own "
+                         "Python interpreters instead of in-process")
+PARSER.add_argument('--verify', action='store_true',
+                    help="Cross-check the font data in the composed image against the font files")
+
+def main(argv=None):
+    args = PARSER.parse_args(argv)
+
+    # Make the tool modules importable so they can run in-process
+    if TOOLS_DIR not in sys.path:
+        sys.path.insert(0, TOOLS_DIR)
+
     print("🚀 STM32G4 Flash Firmware Generator")
     print("=" * 50)
     
-    # Get script directory
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    tools_dir = os.path.join(script_dir, 'tools')
-    assets_dir = os.path.join(script_dir, 'assets')
-    
-    print(f"📁 Working directory: {script_dir}")
-    print(f"🔧 Tools directory: {tools_dir}")
-    print(f"📦 Assets directory: {assets_dir}")
+    print(f"📁 Working directory: {SCRIPT_DIR}")
+    print(f"🔧 Tools directory: {TOOLS_DIR}")
+    print(f"📦 Assets directory: {ASSETS_DIR}")
     print()
     
-    # Change to tools directory
-    os.chdir(tools_dir)
-    
+    # Steps 1-3 produce the inputs of step 4
+    steps = []
+
     # Step 1: Generate 12px font
     print("📝 Step 1: Generate 12px Font Bitmap")
-    if not run_command(
-        f"python3 font_converter.py ../assets/VonwaonBitmap-12px.ttf --output ../assets/font_output/",
+    steps.append((
+        'font_converter',
+        [os.path.join(ASSETS_DIR, 'VonwaonBitmap-12px.ttf'), '--output', FONT_OUTPUT_DIR,
+         '--size', '12', '--filename', 'font_bitmap_12px.bin'],
         "Converting 12px font to bitmap"
-    ):
-        return 1
-    print()
-    
+    ))
+
     # Step 2: Generate 16px font
     print("📝 Step 2: Generate 16px Font Bitmap")
-    if not run_command(
-        f"python3 font_converter.py ../assets/VonwaonBitmap-16px.ttf --output ../assets/font_output/",
+    steps.append((
+        'font_converter',
+        [os.path.join(ASSETS_DIR, 'VonwaonBitmap-16px.ttf'), '--output', FONT_OUTPUT_DIR,
+         '--size', '16', '--filename', 'font_bitmap_16px.bin'],
         "Converting 16px font to bitmap"
-    ):
-        return 1
-    print()
-    
+    ))
+
     # Step 3: Generate boot screen (if SVG exists)
-    boot_screen_svg = os.path.join(assets_dir, 'boot_screen.svg')
+    boot_screen_svg = os.path.join(ASSETS_DIR, 'boot_screen.svg')
     if os.path.exists(boot_screen_svg):
         print("📝 Step 3: Generate Boot Screen")
-        if not run_command(
-            f"python3 svg_to_rgb565.py ../assets/boot_screen.svg --output ../assets/boot_screen_320x172.bin --width 320 --height 172",
+        steps.append((
+            'svg_to_rgb565',
+            ['--output', os.path.join(ASSETS_DIR, 'boot_screen_320x172.bin'), '--width', '320', '--height', '172'],
             "Converting SVG to RGB565 boot screen"
-        ):
-            return 1
-        print()
+        ))
     else:
         print("📝 Step 3: Boot Screen (using existing binary)")
         print("   ⏭️  SVG not found, using existing boot_screen_320x172.bin")
-        print()
+    print()
+
+    if not run_steps(steps, args.isolated):
+        return 1
+    print()
     
     # Step 4: Compose complete Flash image
     print("📝 Step 4: Compose Complete Flash Image")
-    if not run_command(
-        "python3 flash_composer.py",
-        "Composing complete Flash image with auto-deployment"
+    if not run_step(
+        'flash_composer',
+        [],
+        "Composing complete Flash image with auto-deployment",
+        args.isolated
     ):
         return 1
     print()
+
+    # Step 5: Cross-check font data in the composed image
+    if args.verify:
+        from verify_flash_image import verify_flash_font_data
+
+        print("📝 Step 5: Verify Font Data in Flash Image")
+        for font_file, font_base_address in (('font_bitmap_12px.bin', 0x00020000),
+                                             ('font_bitmap_16px.bin', 0x00120000)):
+            if not verify_flash_font_data(OUTPUT_FILE, os.path.join(FONT_OUTPUT_DIR, font_file),
+                                          font_base_address):
+                return 1
+        print()
     
     # Final summary
-    output_file = os.path.join(script_dir, 'w25q128jv_complete.bin')
-    webapp_file = os.path.join(script_dir, 'web-app', 'w25q128jv_complete.bin')
-    
     print("🎉 Flash Firmware Generation Complete!")
     print("=" * 50)
     
-    if os.path.exists(output_file):
-        file_size = os.path.getsize(output_file)
-        print(f"📁 Main firmware: {output_file}")
+    try:
+        file_size = os.stat(OUTPUT_FILE).st_size
+    except FileNotFoundError:
+        pass
+    else:
+        print(f"📁 Main firmware: {OUTPUT_FILE}")
         print(f"📏 Size: {file_size:,} bytes ({file_size // (1024*1024)} MB)")
     
-    if os.path.exists(webapp_file):
-        print(f"🌐 Web preview: {webapp_file}")
+    if os.path.exists(WEBAPP_FILE):
+        print(f"🌐 Web preview: {WEBAPP_FILE}")
         print(f"🔗 Open: web-app/index.html")
     
     print()
-    print("💡 Next steps:")
-    print("   1. Program the firmware to your W25Q128JV Flash")
-    print("   2. Open web-app/index.html to preview the content")
-    print("   3. Use the firmware in your STM32G4 project")
+    print(NEXT_STEPS)
     
     return 0
 
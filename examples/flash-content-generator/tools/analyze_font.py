@@ -6,6 +6,16 @@ Analyze font bitmap data to understand the 'F' character issue
 import os
 import struct
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Character info entry: code point, width, height, bitmap offset
+CHAR_INFO = struct.Struct('<IBBI')
+CHAR_INFO_DTYPE = None if np is None else np.dtype(
+    [('code', '<u4'), ('width', 'u1'), ('height', 'u1'), ('offset', '<u4')])
+
 def analyze_font_file():
     """Analyze the generated font bitmap file"""
     font_path = '../assets/font_output/font_bitmap_12px.bin'
@@ -20,18 +30,31 @@ def analyze_font_file():
         char_count = struct.unpack('<I', char_count_data)[0]
         print(f"Font contains {char_count} characters")
         
+        # Read the whole character info table once (10 bytes each: 4+1+1+4)
+        region = f.read(char_count * CHAR_INFO.size)
+        count = len(region) // CHAR_INFO.size
+        target_chars = [0x0021, 0x0041, 0x0046, 0x0048]  # !, A, F, H
+
+        if np is not None:
+            table = np.frombuffer(region, dtype=CHAR_INFO_DTYPE, count=count)
+            codes = table['code']
+            first_records = table[:100].tolist()  # Check first 100 characters
+            target_records = table[np.isin(codes, target_chars)].tolist()
+            min_char, max_char = int(codes.min()), int(codes.max())
+        else:
+            records = list(CHAR_INFO.iter_unpack(memoryview(region)[:count * CHAR_INFO.size]))
+            codes = [record[0] for record in records]
+            first_records = records[:100]  # Check first 100 characters
+            target_records = [record for record in records if record[0] in target_chars]
+            min_char, max_char = min(codes), max(codes)
+
         # Find ASCII characters and analyze range
         ascii_chars = []
         first_10_chars = []
 
-        for i in range(min(char_count, 100)):  # Check first 100 characters
-            # Read character info (10 bytes: 4+1+1+4)
-            char_info = f.read(10)
-            if len(char_info) < 10:
-                break
-
-            char_code, width, height, bitmap_offset = struct.unpack('<IBBI', char_info)
+        for i, (char_code, width, height, bitmap_offset) in enumerate(first_records):
             if i < 5:  # Only show debug for first 5 chars
+                char_info = region[i * CHAR_INFO.size:(i + 1) * CHAR_INFO.size]
                 print(f"   DEBUG: Raw bytes: {char_info.hex()}")
                 print(f"   DEBUG: Parsed - char_code=0x{char_code:X}, width={width}, height={height}, offset=0x{bitmap_offset:X}")
 
@@ -54,24 +77,14 @@ def analyze_font_file():
         else:
             print("   ❌ No ASCII characters found!")
 
-        # Reset file position and look for specific characters
-        f.seek(4)  # Back to start of character data
-        target_chars = [0x0021, 0x0041, 0x0046, 0x0048]  # !, A, F, H
+        # Look up specific characters
         found_chars = {}
-
-        for i in range(char_count):
-            char_info = f.read(10)
-            if len(char_info) < 10:
-                break
-
-            char_code, width, height, bitmap_offset = struct.unpack('<IBBI', char_info)
-
-            if char_code in target_chars:
-                found_chars[char_code] = {
-                    'width': width,
-                    'height': height,
-                    'bitmap_offset': bitmap_offset
-                }
+        for char_code, width, height, bitmap_offset in target_records:
+            found_chars[char_code] = {
+                'width': width,
+                'height': height,
+                'bitmap_offset': bitmap_offset
+            }
 
         print(f"\n🎯 Target character analysis:")
         for target_char in target_chars:
@@ -83,18 +96,6 @@ def analyze_font_file():
                 print(f"   ❌ '{char_name}' (U+{target_char:04X}): NOT FOUND")
 
         # Show character range analysis
-        f.seek(4)  # Back to start
-        min_char = float('inf')
-        max_char = 0
-
-        for i in range(char_count):
-            char_info = f.read(10)
-            if len(char_info) < 10:
-                break
-            char_code = struct.unpack('<I', char_info[:4])[0]
-            min_char = min(min_char, char_code)
-            max_char = max(max_char, char_code)
-
         print(f"\n📊 Character range in font:")
         print(f"   Minimum: U+{min_char:04X} ({chr(min_char) if 32 <= min_char <= 126 else '?'})")
         print(f"   Maximum: U+{max_char:04X} ({chr(max_char) if 32 <= max_char <= 126 else '?'})")
@@ -7,21 +7,31 @@ Combines all resources into a single 16MB flash image
 import os
 import sys
 import json
+import mmap
 import struct
 import shutil
+import argparse
 
 class FlashComposer:
     """Compose complete flash image for W25Q128JV"""
     
     FLASH_SIZE = 16 * 1024 * 1024  # 16MB
+
+    # Resource names mapped to their files, relative to the assets directory
+    RESOURCE_FILES = {
+        'boot_screen': 'boot_screen_320x172.bin',
+        'font_bitmap_12px': 'font_output/font_bitmap_12px.bin',
+        'font_bitmap_16px': 'font_output/font_bitmap_16px.bin'
+    }
+
+    # Areas left erased in the image
+    EMPTY_RESOURCES = frozenset(['ui_graphics', 'app_data', 'user_config', 'log_storage',
+                                 'firmware_update', 'reserved'])
     
     def __init__(self, assets_dir):
         self.assets_dir = assets_dir
-        self.flash_image = bytearray(self.FLASH_SIZE)
-        
         # Initialize with 0xFF (erased flash state)
-        for i in range(self.FLASH_SIZE):
-            self.flash_image[i] = 0xFF
+        self.flash_image = bytearray(b'\xFF') * self.FLASH_SIZE
     
     def load_resource_layout(self):
         """Load resource layout from JSON"""
@@ -33,31 +43,32 @@ class FlashComposer:
         return layout['resources']
     
     def add_resource(self, name, address, file_path):
-        """Add a resource file to the flash image"""
-        if not os.path.exists(file_path):
+        """Add a resource file to the flash image, returning its size or None on failure"""
+        try:
+            file_size = os.stat(file_path).st_size
+        except FileNotFoundError:
             print(f"⚠️  Resource file not found: {file_path}")
-            return False
-        
-        file_size = os.path.getsize(file_path)
+            return None
         
         if address + file_size > self.FLASH_SIZE:
             print(f"❌ Resource {name} exceeds flash size!")
-            return False
+            return None
         
         print(f"📄 Adding {name}:")
         print(f"   File: {os.path.basename(file_path)}")
         print(f"   Address: 0x{address:08X}")
         print(f"   Size: {file_size:,} bytes")
         
-        with open(file_path, 'rb') as f:
-            data = f.read()
-            
-        # Copy data to flash image
-        for i, byte in enumerate(data):
-            self.flash_image[address + i] = byte
+        # Read the file straight into its place in the flash image
+        with open(file_path, 'rb') as f, memoryview(self.flash_image) as image:
+            bytes_read = f.readinto(image[address:address + file_size])
+        
+        if bytes_read != file_size:
+            print(f"❌ Short read for {name}: {bytes_read} of {file_size} bytes")
+            return None
         
         print(f"   ✅ Added successfully")
-        return True
+        return file_size
     
     def compose_flash_image(self):
         """Compose the complete flash image"""
@@ -76,25 +87,18 @@ class FlashComposer:
             address = resource['address']
             
             # Skip empty/reserved areas
-            if name in ['ui_graphics', 'app_data', 'user_config', 'log_storage',
-                       'firmware_update', 'reserved']:
+            if name in self.EMPTY_RESOURCES:
                 print(f"⏭️  Skipping {name} (empty area)")
                 continue
 
-            # Map resource names to files
-            file_mapping = {
-                'boot_screen': 'boot_screen_320x172.bin',
-                'font_bitmap_12px': 'font_output/font_bitmap_12px.bin',
-                'font_bitmap_16px': 'font_output/font_bitmap_16px.bin'
-            }
-            
-            if name in file_mapping:
-                file_path = os.path.join(self.assets_dir, file_mapping[name])
+            resource_file = self.RESOURCE_FILES.get(name)
+            if resource_file is not None:
+                file_path = os.path.join(self.assets_dir, resource_file)
                 
-                if self.add_resource(name, address, file_path):
+                file_size = self.add_resource(name, address, file_path)
+                if file_size is not None:
                     success_count += 1
-                    if os.path.exists(file_path):
-                        total_used += os.path.getsize(file_path)
+                    total_used += file_size
                 
                 print()  # Empty line for readability
         
@@ -109,16 +113,25 @@ class FlashComposer:
         """Save the complete flash image"""
         print(f"💾 Saving flash image to: {output_path}")
         
-        with open(output_path, 'wb') as f:
-            f.write(self.flash_image)
+        # Write next to the target and swap it in atomically so a reader never
+        # sees a partially written image
+        temp_path = output_path + '.tmp'
+        try:
+            with open(temp_path, 'wb') as f:
+                file_size = f.write(self.flash_image)
+            os.replace(temp_path, output_path)
+        except BaseException:
+            # Don't leave a partial 16MB image behind, e.g. when the disk is full
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
         
-        file_size = os.path.getsize(output_path)
         print(f"   ✅ Saved {file_size:,} bytes ({file_size // (1024*1024)} MB)")
         
         return True
     
-    def verify_flash_image(self, output_path):
-        """Verify the flash image"""
+    def verify_flash_image(self, output_path, in_memory=True):
+        """Verify the flash image, reading the file back only when in_memory is False"""
         print(f"🔍 Verifying flash image...")
         
         # Check file size
@@ -127,46 +140,47 @@ class FlashComposer:
             print(f"❌ Wrong file size: {file_size} (expected {self.FLASH_SIZE})")
             return False
         
-        # Check boot screen
-        with open(output_path, 'rb') as f:
-            # Check boot screen signature (first few bytes)
-            boot_data = f.read(16)
-            if all(b == 0xFF for b in boot_data):
-                print("⚠️  Boot screen area appears empty")
-            else:
-                print("✅ Boot screen data present")
-            
-            # Check 12px font data
-            f.seek(0x00020000)  # 12px Font address
-            font_header_12px = f.read(4)
-            if len(font_header_12px) == 4:
-                char_count_12px = struct.unpack('<I', font_header_12px)[0]
-                if char_count_12px == 27678:
-                    print("✅ 12px Font data verified (27678 characters)")
-                else:
-                    print(f"⚠️  12px Font character count: {char_count_12px} (expected 27678)")
-
-            # Check 16px font data
-            f.seek(0x00120000)  # 16px Font address
-            font_header_16px = f.read(4)
-            if len(font_header_16px) == 4:
-                char_count_16px = struct.unpack('<I', font_header_16px)[0]
-                if char_count_16px == 27678:
-                    print("✅ 16px Font data verified (27678 characters)")
-                else:
-                    print(f"⚠️  16px Font character count: {char_count_16px} (expected 27678)")
-            
-            # Check empty areas are 0xFF
-            f.seek(0x00220000)  # UI graphics area
-            empty_sample = f.read(1024)
-            if all(b == 0xFF for b in empty_sample):
-                print("✅ Empty areas properly initialized (0xFF)")
-            else:
-                print("⚠️  Empty areas contain data")
+        if in_memory:
+            # The saved file was written from this buffer in a single call
+            self.verify_image_data(self.flash_image)
+        else:
+            with open(output_path, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as image:
+                self.verify_image_data(image)
         
         print("✅ Flash image verification complete")
         return True
 
+    def verify_image_data(self, image):
+        """Check resource signatures in a flash image buffer"""
+        # Check boot screen signature (first few bytes)
+        boot_data = image[0:16]
+        if boot_data.count(0xFF) == len(boot_data):
+            print("⚠️  Boot screen area appears empty")
+        else:
+            print("✅ Boot screen data present")
+        
+        # Check 12px font data
+        char_count_12px = struct.unpack_from('<I', image, 0x00020000)[0]  # 12px Font address
+        if char_count_12px == 27678:
+            print("✅ 12px Font data verified (27678 characters)")
+        else:
+            print(f"⚠️  12px Font character count: {char_count_12px} (expected 27678)")
+
+        # Check 16px font data
+        char_count_16px = struct.unpack_from('<I', image, 0x00120000)[0]  # 16px Font address
+        if char_count_16px == 27678:
+            print("✅ 16px Font data verified (27678 characters)")
+        else:
+            print(f"⚠️  16px Font character count: {char_count_16px} (expected 27678)")
+        
+        # Check empty areas are 0xFF
+        empty_sample = image[0x00220000:0x00220000 + 1024]  # UI graphics area
+        if empty_sample.count(0xFF) == len(empty_sample):
+            print("✅ Empty areas properly initialized (0xFF)")
+        else:
+            print("⚠️  Empty areas contain data")
+
     def copy_to_webapp(self, source_path):
         """Copy firmware to web-app directory for preview"""
         # Get the web-app directory path
@@ -185,19 +199,19 @@ class FlashComposer:
             shutil.copy2(source_path, destination_path)
 
             # Verify copy
-            if os.path.exists(destination_path):
-                dest_size = os.path.getsize(destination_path)
-                src_size = os.path.getsize(source_path)
+            try:
+                dest_size = os.stat(destination_path).st_size
+            except FileNotFoundError:
+                print(f"   ❌ Copy failed: destination file not found")
+                return False
 
-                if dest_size == src_size:
-                    print(f"   ✅ Successfully copied to: {destination_path}")
-                    print(f"   📏 Size: {dest_size:,} bytes")
-                    return True
-                else:
-                    print(f"   ❌ Size mismatch: {dest_size} != {src_size}")
-                    return False
+            src_size = os.stat(source_path).st_size
+            if dest_size == src_size:
+                print(f"   ✅ Successfully copied to: {destination_path}")
+                print(f"   📏 Size: {dest_size:,} bytes")
+                return True
             else:
-                print(f"   ❌ Copy failed: destination file not found")
+                print(f"   ❌ Size mismatch: {dest_size} != {src_size}")
                 return False
 
         except Exception as e:
@@ -205,7 +219,11 @@ class FlashComposer:
             return False
 
 
-def main():
+PARSER = argparse.ArgumentParser(description="Combine all resources into a single 16MB flash image")
+
+def main(argv=None):
+    PARSER.parse_args(argv)
+
     # Get script directory
     script_dir = os.path.dirname(os.path.abspath(__file__))
     assets_dir = os.path.join(os.path.dirname(script_dir), 'assets')
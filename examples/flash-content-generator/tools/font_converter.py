@@ -7,9 +7,30 @@ Converts TTF fonts to bitmap format for embedded systems
 import os
 import sys
 import struct
+import argparse
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image, ImageDraw, ImageFont
 
-def convert_font_to_bitmap(font_path, output_dir, font_size=12, output_filename="font_bitmap.bin"):
+# Buffer size for the bitmap file, large enough to hold a whole font so the
+# many small table writes end up in a handful of write syscalls
+IO_BUFFER_SIZE = 1 << 20
+
+# Binary layout: character count header, then one info entry per character
+HEADER = struct.Struct('<I')
+CHAR_INFO = struct.Struct('<IBBI')  # code point, width, height, bitmap offset
+
+# Code points per work item when extracting glyphs in parallel
+GLYPH_CHUNK_SIZE = 2048
+
+# Largest glyph width or height kept in the bitmap font
+MAX_GLYPH_SIZE = 32
+
+# translate() tables turning pixels above each threshold into b'1', others into b'0'
+THRESHOLD_TABLES = [b'0' * (t + 1) + b'1' * (255 - t) for t in range(256)]
+
+def convert_font_to_bitmap(font_path, output_dir, font_size=12, output_filename="font_bitmap.bin",
+                           mapped_only=False):
     """Convert TTF font to bitmap format for embedded systems"""
     print(f"Converting font: {font_path}")
     print(f"Font size: {font_size}px")
@@ -28,12 +49,27 @@ def convert_font_to_bitmap(font_path, output_dir, font_size=12, output_filename=
             (0x3400, 0x4DBF, "CJK_EXT_A"),   # CJK Extension A
         ]
 
+        # Optionally restrict the ranges to code points the font actually maps
+        code_points = load_font_code_points(font_path) if mapped_only else None
+
+        # Code points are independent, spread them over worker processes when possible
+        range_data = None
+        if (os.cpu_count() or 1) > 1:
+            try:
+                range_data = extract_ranges_parallel(font_path, font_size, char_ranges, code_points)
+            except (NotImplementedError, OSError) as e:
+                # Hosts without working semaphores cannot start a process pool
+                print(f"⚠️  Process pool unavailable ({e}), extracting characters sequentially")
+        if range_data is None:
+            range_data = [extract_character_range(font, font_path, font_size, start, end, name,
+                                                  code_points)
+                          for start, end, name in char_ranges]
+
         all_char_data = []
         total_chars = 0
 
-        for start, end, name in char_ranges:
+        for (start, end, name), char_data in zip(char_ranges, range_data):
             print(f"Processing {name} range: 0x{start:04X} - 0x{end:04X}")
-            char_data = extract_character_range(font, font_path, font_size, start, end, name)
             all_char_data.extend(char_data)
             total_chars += len(char_data)
             print(f"  Extracted {len(char_data)} characters")
@@ -63,11 +99,58 @@ def convert_font_to_bitmap(font_path, output_dir, font_size=12, output_filename=
         print(f"Error converting font: {e}")
         return False
 
-def extract_character_range(font, font_path, font_size, start_code, end_code, range_name):
-    """Extract character bitmaps from a Unicode range"""
+def load_font_code_points(font_path):
+    """Return the set of code points in the font's cmap, or None if it cannot be read"""
+    try:
+        from fontTools.ttLib import TTFont
+    except ImportError:
+        print("⚠️  fontTools not installed, converting every code point in the ranges")
+        return None
+
+    with TTFont(font_path, lazy=True) as ttfont:
+        code_points = frozenset(ttfont.getBestCmap() or ())
+    print(f"Font maps {len(code_points)} code points")
+    return code_points
+
+def extract_ranges_parallel(font_path, font_size, char_ranges, code_points=None):
+    """Extract character ranges in chunks spread over a process pool"""
+    chunks = [(chunk_start, min(chunk_start + GLYPH_CHUNK_SIZE - 1, end), name)
+              for start, end, name in char_ranges
+              for chunk_start in range(start, end + 1, GLYPH_CHUNK_SIZE)]
+    starts, ends, names = zip(*chunks)
+
+    range_data = {name: [] for _, _, name in char_ranges}
+    with ProcessPoolExecutor() as executor:
+        results = executor.map(extract_font_chunk, repeat(font_path), repeat(font_size),
+                               starts, ends, names, repeat(code_points))
+        for name, char_data in zip(names, results):
+            range_data[name].extend(char_data)
+
+    return [range_data[name] for _, _, name in char_ranges]
+
+def extract_font_chunk(font_path, font_size, start_code, end_code, range_name, code_points=None):
+    """Extract one chunk of a character range in a worker process"""
+    # FreeType fonts cannot be pickled, each worker opens the font itself
+    font = ImageFont.truetype(font_path, font_size)
+    return extract_character_range(font, font_path, font_size, start_code, end_code, range_name,
+                                   code_points)
+
+def extract_character_range(font, font_path, font_size, start_code, end_code, range_name,
+                            code_points=None):
+    """Extract character bitmaps from a Unicode range, limited to code_points when given"""
     char_data = []
 
-    for char_code in range(start_code, end_code + 1):  # Generate all characters in range
+    # One canvas large enough for any accepted glyph, cleared and reused for
+    # every character instead of allocating an image and draw context each time
+    canvas_box = (0, 0, MAX_GLYPH_SIZE, MAX_GLYPH_SIZE)
+    canvas = Image.new('L', canvas_box[2:], 0)
+    draw = ImageDraw.Draw(canvas)
+
+    char_codes = range(start_code, end_code + 1)  # Generate all characters in range
+    if code_points is not None:
+        char_codes = [char_code for char_code in char_codes if char_code in code_points]
+
+    for char_code in char_codes:
         try:
             char = chr(char_code)
 
@@ -80,18 +163,15 @@ def extract_character_range(font, font_path, font_size, start_code, end_code, ra
             char_height = bbox[3] - bbox[1]
 
             # Limit character size to reasonable bounds
-            if char_width > 32 or char_height > 32:
+            if char_width > MAX_GLYPH_SIZE or char_height > MAX_GLYPH_SIZE:
                 continue
 
-            # Create image for character
-            img = Image.new('L', (char_width, char_height), 0)
-            draw = ImageDraw.Draw(img)
-
             # Draw character
+            canvas.paste(0, canvas_box)
             draw.text((-bbox[0], -bbox[1]), char, font=font, fill=255)
 
             # Convert to 1-bit bitmap
-            bitmap_data = convert_to_bitmap(img)
+            bitmap_data = convert_to_bitmap(canvas.crop((0, 0, char_width, char_height)))
 
             char_info = {
                 'char_code': char_code,
@@ -114,36 +194,32 @@ def extract_character_range(font, font_path, font_size, start_code, end_code, ra
 def convert_to_bitmap(img):
     """Convert PIL image to 1-bit bitmap data with improved thresholding"""
     width, height = img.size
-    bitmap_data = bytearray()
-    pixels = img.load()
+    # Raw 8-bit pixels, row-major, indexed directly instead of via PixelAccess
+    pixels = img.tobytes()
 
     # Calculate adaptive threshold using Otsu's method approximation
-    histogram = [0] * 256
+    histogram = img.histogram()  # Pixel counts per 8-bit level, built in Pillow's C core
     total_pixels = width * height
 
-    # Build histogram
-    for y in range(height):
-        for x in range(width):
-            histogram[pixels[x, y]] += 1
-
-    # Find optimal threshold using variance-based method
-    sum_total = sum(i * histogram[i] for i in range(256))
+    # Find optimal threshold using variance-based method. Only occupied levels
+    # are visited: an empty level leaves the sums, and so the variance, unchanged
+    # from the previous one, so it can never become the new maximum
+    levels = [(t, count) for t, count in enumerate(histogram) if count]
+    sum_total = sum(t * count for t, count in levels)
     sum_background = 0
     weight_background = 0
     weight_foreground = 0
     variance_max = 0
     threshold = 128  # default fallback
 
-    for t in range(256):
-        weight_background += histogram[t]
-        if weight_background == 0:
-            continue
+    for t, count in levels:
+        weight_background += count
 
         weight_foreground = total_pixels - weight_background
         if weight_foreground == 0:
             break
 
-        sum_background += t * histogram[t]
+        sum_background += t * count
         mean_background = sum_background / weight_background
         mean_foreground = (sum_total - sum_background) / weight_foreground
 
@@ -153,50 +229,42 @@ def convert_to_bitmap(img):
             variance_max = variance_between
             threshold = t
 
-    # Convert to bitmap using adaptive threshold
-    for y in range(height):
-        byte_val = 0
-        bit_count = 0
-
-        for x in range(width):
-            # Use adaptive threshold for better quality
-            pixel = 1 if pixels[x, y] > threshold else 0
-            byte_val |= (pixel << (7 - bit_count))
-            bit_count += 1
-
-            if bit_count == 8:
-                bitmap_data.append(byte_val)
-                byte_val = 0
-                bit_count = 0
-
-        # Handle remaining bits in the row
-        if bit_count > 0:
-            bitmap_data.append(byte_val)
-
-    return bytes(bitmap_data)
+    # Convert to bitmap using adaptive threshold: one '0'/'1' digit per pixel,
+    # each row padded to a whole byte, then parsed as one MSB-first integer
+    bits = pixels.translate(THRESHOLD_TABLES[threshold])
+    padding = b'0' * (-width % 8)
+    if padding:
+        bits = b''.join([bits[row_start:row_start + width] + padding
+                         for row_start in range(0, width * height, width)])
+    return int(bits, 2).to_bytes(len(bits) // 8, 'big')
 
 def generate_bitmap_file(char_data, output_path):
     """Generate binary bitmap file"""
-    with open(output_path, 'wb') as f:
-        # Write header
-        f.write(struct.pack('<I', len(char_data)))  # Number of characters
+    char_count = len(char_data)
 
-        # Calculate bitmap offsets
-        header_size = 4  # Character count
-        char_info_size = len(char_data) * 10  # 10 bytes per character info (changed from 8)
-        bitmap_offset = header_size + char_info_size
+    # Calculate bitmap offsets
+    header_size = HEADER.size  # Character count
+    char_info_size = char_count * CHAR_INFO.size  # 10 bytes per character info (changed from 8)
+    bitmap_offset = header_size + char_info_size
 
-        # Write character info table
-        for char_info in char_data:
-            f.write(struct.pack('<I', char_info['char_code']))  # Unicode code point
-            f.write(struct.pack('<B', char_info['width']))      # Width
-            f.write(struct.pack('<B', char_info['height']))     # Height
-            f.write(struct.pack('<I', bitmap_offset))           # Bitmap offset (changed to 32-bit)
-            bitmap_offset += char_info['bitmap_size']
+    # Build header and character info table in one preallocated buffer
+    table = bytearray(header_size + char_info_size)
+    HEADER.pack_into(table, 0, char_count)  # Number of characters
+
+    pack_into = CHAR_INFO.pack_into
+    offset = header_size
+    for char_info in char_data:
+        # Unicode code point, width, height, bitmap offset (changed to 32-bit)
+        pack_into(table, offset, char_info['char_code'], char_info['width'],
+                  char_info['height'], bitmap_offset)
+        offset += CHAR_INFO.size
+        bitmap_offset += char_info['bitmap_size']
+
+    with open(output_path, 'wb', buffering=IO_BUFFER_SIZE) as f:
+        f.write(table)
 
         # Write bitmap data
-        for char_info in char_data:
-            f.write(char_info['bitmap_data'])
+        f.writelines(char_info['bitmap_data'] for char_info in char_data)
 
 def generate_bitmap_info(char_data, output_path, font_size, total_chars):
     """Generate text file with bitmap font information"""
@@ -210,22 +278,25 @@ def generate_bitmap_info(char_data, output_path, font_size, total_chars):
         f.write(f"Format: 1-bit monochrome bitmap\n")
         f.write(f"Encoding: Unicode (UTF-16)\n\n")
 
-        # Character ranges
+        # Character ranges: count and code point bounds gathered in a single pass
         ranges = {}
         for char_info in char_data:
-            range_name = char_info['range']
-            if range_name not in ranges:
-                ranges[range_name] = []
-            ranges[range_name].append(char_info)
+            char_code = char_info['char_code']
+            stats = ranges.get(char_info['range'])
+            if stats is None:
+                ranges[char_info['range']] = [1, char_code, char_code]
+            else:
+                stats[0] += 1
+                if char_code < stats[1]:
+                    stats[1] = char_code
+                elif char_code > stats[2]:
+                    stats[2] = char_code
 
         f.write("Character Ranges:\n")
         f.write("=================\n")
-        for range_name, chars in ranges.items():
-            f.write(f"{range_name}: {len(chars)} characters\n")
-            if chars:
-                min_code = min(c['char_code'] for c in chars)
-                max_code = max(c['char_code'] for c in chars)
-                f.write(f"  Range: U+{min_code:04X} - U+{max_code:04X}\n")
+        for range_name, (count, min_code, max_code) in ranges.items():
+            f.write(f"{range_name}: {count} characters\n")
+            f.write(f"  Range: U+{min_code:04X} - U+{max_code:04X}\n")
         f.write("\n")
 
         # Binary format
@@ -266,15 +337,45 @@ def generate_bitmap_info(char_data, output_path, font_size, total_chars):
         if len(char_data) > 20:
             f.write(f"... and {len(char_data) - 20} more characters\n")
 
-def main():
+PARSER = argparse.ArgumentParser(description="Convert TTF fonts to bitmap format for embedded systems")
+PARSER.add_argument('font_file', nargs='?',
+                    help="TTF font to convert (default: both bundled 12px and 16px fonts)")
+PARSER.add_argument('--output', help="Output directory for generated files")
+PARSER.add_argument('--size', type=int, default=12, help="Font size in pixels (default: 12)")
+PARSER.add_argument('--filename', default="font_bitmap.bin",
+                    help="Output filename (default: font_bitmap.bin)")
+PARSER.add_argument('--mapped-only', action='store_true',
+                    help="Skip code points missing from the font's cmap instead of storing "
+                         "their .notdef glyph (requires fontTools)")
+
+def main(argv=None):
+    args = PARSER.parse_args(argv)
+
     # Get script directory
     script_dir = os.path.dirname(os.path.abspath(__file__))
     assets_dir = os.path.join(os.path.dirname(script_dir), 'assets')
+    output_dir = args.output or os.path.join(assets_dir, 'font_output')
+
+    # Convert a single font when one is given on the command line
+    if args.font_file:
+        print("=== Font Bitmap Converter ===")
+        print(f"Output directory: {output_dir}")
+
+        if not os.path.exists(args.font_file):
+            print(f"Error: font file not found: {args.font_file}")
+            return 1
+
+        if convert_font_to_bitmap(args.font_file, output_dir, font_size=args.size, output_filename=args.filename,
+                                  mapped_only=args.mapped_only):
+            print(f"✅ {args.size}px font conversion completed successfully!")
+            return 0
+        else:
+            print(f"❌ {args.size}px font conversion failed!")
+            return 1
 
     # Font paths for both 12px and 16px fonts
     font_12px_path = os.path.join(assets_dir, 'VonwaonBitmap-12px.ttf')
     font_16px_path = os.path.join(assets_dir, 'VonwaonBitmap-16px.ttf')
-    output_dir = os.path.join(assets_dir, 'font_output')
 
     print("=== Font Bitmap Converter ===")
     print("Converting both 12px and 16px fonts...")
@@ -293,7 +394,8 @@ def main():
 
     # Convert 12px font
     print(f"\n🔤 Converting 12px font: {font_12px_path}")
-    if convert_font_to_bitmap(font_12px_path, output_dir, font_size=12, output_filename="font_bitmap_12px.bin"):
+    if convert_font_to_bitmap(font_12px_path, output_dir, font_size=12, output_filename="font_bitmap_12px.bin",
+                              mapped_only=args.mapped_only):
         print("✅ 12px font conversion completed successfully!")
         success_count += 1
     else:
@@ -301,7 +403,8 @@ def main():
 
     # Convert 16px font
     print(f"\n🔤 Converting 16px font: {font_16px_path}")
-    if convert_font_to_bitmap(font_16px_path, output_dir, font_size=16, output_filename="font_bitmap_16px.bin"):
+    if convert_font_to_bitmap(font_16px_path, output_dir, font_size=16, output_filename="font_bitmap_16px.bin",
+                              mapped_only=args.mapped_only):
         print("✅ 16px font conversion completed successfully!")
         success_count += 1
     else:
@@ -7,17 +7,46 @@ Creates a 320x172 boot screen bitmap in RGB565 format for W25Q128JV flash memory
 import os
 import sys
 import struct
-from PIL import Image, ImageDraw, ImageFont
+import argparse
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Pre-shifted RGB565 contribution of every 8-bit channel value
+R_LUT = tuple((r >> 3) << 11 for r in range(256))
+G_LUT = tuple((g >> 2) << 5 for g in range(256))
+B_LUT = tuple(b >> 3 for b in range(256))
+
+# Per-byte contributions for the Pillow conversion path
+GREEN_LOW_LUT = [(G_LUT[v] & 0xFF) for v in range(256)]
+BLUE_LOW_LUT = list(B_LUT)
+RED_HIGH_LUT = [R_LUT[v] >> 8 for v in range(256)]
+GREEN_HIGH_LUT = [G_LUT[v] >> 8 for v in range(256)]
 
 def rgb888_to_rgb565(r, g, b):
     """Convert RGB888 to RGB565 format (little-endian)"""
-    r5 = (r >> 3) & 0x1F
-    g6 = (g >> 2) & 0x3F  
-    b5 = (b >> 3) & 0x1F
-    rgb565 = (r5 << 11) | (g6 << 5) | b5
+    rgb565 = R_LUT[r] | G_LUT[g] | B_LUT[b]
     # Return as little-endian bytes
     return struct.pack('<H', rgb565)
 
+def image_to_rgb565(image):
+    """Convert an RGB image to RGB565 little-endian bytes"""
+    if np is not None:
+        # Whole-image conversion, the per-pixel loop below is the fallback without NumPy
+        pixels = np.asarray(image, dtype=np.uint16)
+        rgb565 = ((pixels[..., 0] >> 3) << 11) | ((pixels[..., 1] >> 2) << 5) | (pixels[..., 2] >> 3)
+        return rgb565.astype('<u2').tobytes()
+
+    # Without NumPy, build the low and high bytes with Pillow's band operations;
+    # the bit fields do not overlap, so adding them is the same as OR-ing them
+    r, g, b = image.split()
+    low = ImageChops.add(g.point(GREEN_LOW_LUT), b.point(BLUE_LOW_LUT))
+    high = ImageChops.add(r.point(RED_HIGH_LUT), g.point(GREEN_HIGH_LUT))
+    return Image.merge('LA', (low, high)).tobytes()
+
 def create_boot_screen(output_path, width=320, height=172):
     """Create boot screen bitmap using PIL"""
     print(f"Creating boot screen bitmap {width}x{height}...")
@@ -125,14 +154,7 @@ def create_boot_screen(output_path, width=320, height=172):
         print(f"Image created: {image.size}")
 
         # Convert to RGB565 format
-        rgb565_data = bytearray()
-        pixels = image.load()
-
-        for y in range(height):
-            for x in range(width):
-                r, g, b = pixels[x, y]
-                rgb565_bytes = rgb888_to_rgb565(r, g, b)
-                rgb565_data.extend(rgb565_bytes)
+        rgb565_data = image_to_rgb565(image)
 
         # Write to output file
         with open(output_path, 'wb') as f:
@@ -174,22 +196,29 @@ def create_test_pattern(output_path, width=320, height=172):
     print(f"✓ Test pattern created: {output_path}")
     print(f"File size: {len(rgb565_data)} bytes")
 
-def main():
+PARSER = argparse.ArgumentParser(description="Generate RGB565 boot screen bitmap for W25Q128JV flash memory")
+PARSER.add_argument('--output', help="Output binary file path")
+PARSER.add_argument('--width', type=int, default=320, help="Target width in pixels (default: 320)")
+PARSER.add_argument('--height', type=int, default=172, help="Target height in pixels (default: 172)")
+
+def main(argv=None):
+    args = PARSER.parse_args(argv)
+
     # Get script directory
     script_dir = os.path.dirname(os.path.abspath(__file__))
     assets_dir = os.path.join(os.path.dirname(script_dir), 'assets')
 
     # Output path
-    output_path = os.path.join(assets_dir, 'boot_screen_320x172.bin')
+    output_path = args.output or os.path.join(assets_dir, 'boot_screen_320x172.bin')
 
     print("=== Boot Screen Generator ===")
     print(f"Output bitmap: {output_path}")
 
-    # Create assets directory if it doesn't exist
-    os.makedirs(assets_dir, exist_ok=True)
+    # Create output directory if it doesn't exist
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
 
     # Create boot screen
-    if create_boot_screen(output_path):
+    if create_boot_screen(output_path, args.width, args.height):
         print("\n=== Boot Screen Generation Complete ===")
         print("The RGB565 bitmap is ready for programming to W25Q128JV flash memory.")
         print("Use this bitmap as the boot screen for your STM32G4 project.")
@@ -197,7 +226,7 @@ def main():
     else:
         print("\n=== Boot Screen Generation Failed ===")
         print("Creating test pattern instead...")
-        create_test_pattern(output_path)
+        create_test_pattern(output_path, args.width, args.height)
         return 1
 
 if __name__ == "__main__":
@@ -4,133 +4,111 @@ Verify Flash image contains correct font data
 """
 
 import os
+import mmap
 import struct
 
-def verify_flash_font_data():
-    """Verify the 'F' character in the flash image"""
-    flash_image_path = '../w25q128jv_complete.bin'
-    font_file_path = '../assets/font_output/font_bitmap.bin'
-    
-    if not os.path.exists(flash_image_path):
-        print(f"Flash image not found: {flash_image_path}")
-        return
-    
-    if not os.path.exists(font_file_path):
-        print(f"Font file not found: {font_file_path}")
-        return
+# Character info entry: code point, width, height, bitmap offset
+CHAR_INFO = struct.Struct('<IBBI')
+
+def find_char_bitmap(data, base_address, target_char):
+    """Find a character in the font stored at base_address and read its bitmap"""
+    # Read header
+    if len(data) < base_address + 4:
+        return None
+    char_count = struct.unpack_from('<I', data, base_address)[0]
+
+    table_start = base_address + 4
+    char_count = min(char_count, (len(data) - table_start) // CHAR_INFO.size)
+
+    for i in range(char_count):
+        char_code, width, height, bitmap_offset = CHAR_INFO.unpack_from(
+            data, table_start + i * CHAR_INFO.size)
+
+        if char_code == target_char:
+            # Read bitmap data
+            bitmap_start = base_address + bitmap_offset
+            bytes_per_row = (width + 7) // 8
+            bitmap_size = bytes_per_row * height
+            return {
+                'char_code': char_code,
+                'width': width,
+                'height': height,
+                'bitmap_offset': bitmap_offset,
+                'bitmap_data': bytes(data[bitmap_start:bitmap_start + bitmap_size])
+            }
+
+    return None
+
+def map_file(path):
+    """Map a file read-only so only the pages actually inspected are read from disk"""
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def verify_flash_font_data(flash_image_path=None, font_file_path=None, font_base_address=0x00020000,
+                           target_char=0x0046):
+    """Verify a character (default 'F') in the flash image matches the font file"""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_dir = os.path.dirname(script_dir)
+    if flash_image_path is None:
+        flash_image_path = os.path.join(project_dir, 'w25q128jv_complete.bin')
+    if font_file_path is None:
+        font_file_path = os.path.join(project_dir, 'assets', 'font_output', 'font_bitmap_12px.bin')
+
+    for label, path in (("Flash image", flash_image_path), ("Font file", font_file_path)):
+        try:
+            size = os.stat(path).st_size
+        except FileNotFoundError:
+            print(f"{label} not found: {path}")
+            return False
+        # mmap cannot map an empty file
+        if size == 0:
+            print(f"{label} is empty: {path}")
+            return False
     
+    char_display = chr(target_char)
     print("🔍 Verifying Flash image font data...")
     
-    # Read 'F' character from original font file
-    with open(font_file_path, 'rb') as f:
-        # Read header
-        char_count_data = f.read(4)
-        char_count = struct.unpack('<I', char_count_data)[0]
-        
-        # Find 'F' character
-        target_char = 0x0046
-        f_char_info = None
-        
-        for i in range(char_count):
-            char_info = f.read(8)
-            if len(char_info) < 8:
-                break
-                
-            char_code, width, height, bitmap_offset = struct.unpack('<IBBH', char_info)
-            
-            if char_code == target_char:
-                f_char_info = {
-                    'char_code': char_code,
-                    'width': width,
-                    'height': height,
-                    'bitmap_offset': bitmap_offset
-                }
-                
-                # Read bitmap data
-                current_pos = f.tell()
-                f.seek(bitmap_offset)
-                bytes_per_row = (width + 7) // 8
-                bitmap_size = bytes_per_row * height
-                bitmap_data = f.read(bitmap_size)
-                f_char_info['bitmap_data'] = bitmap_data
-                f.seek(current_pos)
-                break
+    # Read character from original font file
+    with map_file(font_file_path) as data:
+        f_char_info = find_char_bitmap(data, 0, target_char)
     
     if not f_char_info:
-        print("❌ 'F' character not found in font file!")
-        return
+        print(f"❌ '{char_display}' character not found in font file!")
+        return False
     
-    print(f"✅ Found 'F' in font file:")
+    print(f"✅ Found '{char_display}' in font file:")
     print(f"   Size: {f_char_info['width']}x{f_char_info['height']}")
-    print(f"   Bitmap: {list(f_char_info['bitmap_data'])}")
     print(f"   Hex: {' '.join(f'{b:02X}' for b in f_char_info['bitmap_data'])}")
     
     # Now check the same data in flash image
-    font_base_address = 0x00020000
-    
-    with open(flash_image_path, 'rb') as f:
-        # Seek to font area
-        f.seek(font_base_address)
-        
-        # Read header
-        char_count_data = f.read(4)
-        char_count = struct.unpack('<I', char_count_data)[0]
-        print(f"\n🔍 Flash image font area:")
-        print(f"   Character count: {char_count}")
-        
-        # Find 'F' character in flash
-        flash_f_char_info = None
-        
-        for i in range(char_count):
-            char_info = f.read(8)
-            if len(char_info) < 8:
-                break
-                
-            char_code, width, height, bitmap_offset = struct.unpack('<IBBH', char_info)
-            
-            if char_code == target_char:
-                flash_f_char_info = {
-                    'char_code': char_code,
-                    'width': width,
-                    'height': height,
-                    'bitmap_offset': bitmap_offset
-                }
-                
-                # Read bitmap data from flash
-                current_pos = f.tell()
-                f.seek(font_base_address + bitmap_offset)
-                bytes_per_row = (width + 7) // 8
-                bitmap_size = bytes_per_row * height
-                bitmap_data = f.read(bitmap_size)
-                flash_f_char_info['bitmap_data'] = bitmap_data
-                f.seek(current_pos)
-                break
+    with map_file(flash_image_path) as data:
+        flash_f_char_info = find_char_bitmap(data, font_base_address, target_char)
     
     if not flash_f_char_info:
-        print("❌ 'F' character not found in flash image!")
-        return
+        print(f"❌ '{char_display}' character not found in flash image!")
+        return False
     
-    print(f"✅ Found 'F' in flash image:")
+    print(f"✅ Found '{char_display}' in flash image at 0x{font_base_address:08X}:")
     print(f"   Size: {flash_f_char_info['width']}x{flash_f_char_info['height']}")
-    print(f"   Bitmap: {list(flash_f_char_info['bitmap_data'])}")
     print(f"   Hex: {' '.join(f'{b:02X}' for b in flash_f_char_info['bitmap_data'])}")
     
     # Compare the data
-    print(f"\n📊 Comparison:")
     font_data = f_char_info['bitmap_data']
     flash_data = flash_f_char_info['bitmap_data']
     
     if font_data == flash_data:
         print("✅ Font data matches perfectly!")
-    else:
-        print("❌ Font data MISMATCH!")
-        print(f"   Font file:  {list(font_data)}")
-        print(f"   Flash image: {list(flash_data)}")
-        
-        # Show differences
-        for i, (f_byte, fl_byte) in enumerate(zip(font_data, flash_data)):
-            if f_byte != fl_byte:
-                print(f"   Byte {i}: Font=0x{f_byte:02X}, Flash=0x{fl_byte:02X}")
+        return True
+
+    print("❌ Font data MISMATCH!")
+    print(f"   Font file:  {list(font_data)}")
+    print(f"   Flash image: {list(flash_data)}")
+
+    # Show differences
+    for i, (f_byte, fl_byte) in enumerate(zip(font_data, flash_data)):
+        if f_byte != fl_byte:
+            print(f"   Byte {i}: Font=0x{f_byte:02X}, Flash=0x{fl_byte:02X}")
+    return False
 
 if __name__ == "__main__":
-    verify_flash_font_data()
+    exit(0 if verify_flash_font_data() else 1)